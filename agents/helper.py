@@ -1,15 +1,17 @@
 """
 Simple Agent Helper Functions
 """
-from typing import Dict, Any, List, Union
-# from utils.utility import read_data_from_image #,read_data_from_file
+from typing import Dict, Any, List
+import tempfile
+import threading
+from utils.utility import read_data_from_image #,read_data_from_file
 # from utils.text_extractor_docling import extract_text
 from utils.text_extract_MistralAI import extract_text_from_pdf, extract_text_from_image
-from pdf2image import convert_from_path
 from youtube_transcript_api import YouTubeTranscriptApi
 from pytube import YouTube
 import whisper
 from cleantext import clean
+from config.settings import IMAGE_TEXT_EXTRACTOR
 
 # def clean_for_llm_prompt(raw_text):
 #     """
@@ -33,6 +35,23 @@ from cleantext import clean
 #     return cleaned.strip()
 
 
+_WHISPER_MODEL = None
+_WHISPER_MODEL_LOCK = threading.Lock()
+# Whisper's decoder installs per-call kv-cache hooks on the shared model,
+# so transcriptions must not overlap
+_WHISPER_TRANSCRIBE_LOCK = threading.Lock()
+
+
+def get_whisper_model():
+    """Load the Whisper model once and reuse it across transcriptions"""
+    global _WHISPER_MODEL
+    if _WHISPER_MODEL is None:
+        with _WHISPER_MODEL_LOCK:
+            if _WHISPER_MODEL is None:
+                _WHISPER_MODEL = whisper.load_model("base")
+    return _WHISPER_MODEL
+
+
 def get_youtube_transcript(video_url):
     video_id = video_url.split("v=")[-1]
 
@@ -43,44 +62,28 @@ def get_youtube_transcript(video_url):
         return text
     except:
 
-        # Download audio
+        # Download audio (per-call directory, transcriptions may run concurrently)
         yt = YouTube(video_url)
         audio_stream = yt.streams.filter(only_audio=True).first()
-        audio_path = audio_stream.download(filename='audio.mp4')
+        with tempfile.TemporaryDirectory() as audio_dir:
+            audio_path = audio_stream.download(output_path=audio_dir, filename='audio.mp4')
 
-        # Transcribe using Whisper
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_path)
+            # Transcribe using Whisper
+            model = get_whisper_model()
+            with _WHISPER_TRANSCRIBE_LOCK:
+                result = model.transcribe(audio_path)
         return result['text']
 
 
-# def extract_content_from_files(pdf_path: str = None, image_paths: List[str] = None) -> str:
-#     """Extract content from files"""
-#     if pdf_path:
-#         # Convert PDF to images using pdf2image
-#         images = convert_from_path(pdf_path, dpi=300)
-#         return read_data_from_image(images)
-#     elif image_paths:
-#         return read_data_from_image(image_paths)
-#     return "ERROR: No files provided"
-
-# def extract_content_from_files(pdf_path: str = None, image_paths: List[str] = None) -> str:
-#     """Extract content from files"""
-#     if pdf_path:
-#         # For PDF files, use the text_extractor directly
-#         return extract_text(pdf_path, export_format="markdown")
-#     elif image_paths:
-#         # For image files, use the text_extractor
-#         return extract_text(image_paths, export_format="markdown")
-#     return "ERROR: No files provided"
-
 def extract_content_from_files(pdf_path: str = None, image_paths: List[str] = None) -> str:
     """Extract content from files"""
     if pdf_path:
         # For PDF files, use the text_extractor directly
         return extract_text_from_pdf(pdf_path)
     elif image_paths:
-        # For image files, use the text_extractor
+        # For image files, use the configured extractor
+        if IMAGE_TEXT_EXTRACTOR == "vision":
+            return read_data_from_image(image_paths)
         return extract_text_from_image(image_paths)
     return "ERROR: No files provided"
 
@@ -98,24 +101,6 @@ def create_initial_state(standard: str, subject: str, chapter: str, content: str
         "validation_result": None
     }
 
-# def format_response(state: Dict[str, Any]) -> Dict[str, Any]:
-#     """Format response"""
-#     if state.get("error"):
-#         return {
-#             "success": False, 
-#             "error": state["error"]
-#         }
-#     return {
-#         "success": True,
-#         "content": state.get("generated_content", ""),
-#         "validation_result": state.get("validation_result"),
-#         "metadata": {
-#             "standard": state.get("standard"),
-#             "subject": state.get("subject"),
-#             "chapter": state.get("chapter")
-#         }
-#     } 
-
 def format_response(state: Dict[str, Any]) -> Dict[str, Any]:
     """Format response"""
     if state.get("error"):
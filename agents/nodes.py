@@ -1,13 +1,15 @@
 """
 Graph Nodes following SOLID principles
 """
-from typing import Dict, Any, Protocol, Optional, List
+from typing import Dict, Any, Protocol, Optional, List, Mapping
 from dataclasses import dataclass
+from functools import lru_cache
 from abc import ABC, abstractmethod
-from config.configuration import get_validation_llm, get_generation_llm
+from config.configuration import get_validation_llm, get_generation_llm, get_model_name
 from config.logging import get_logger
 from config.settings import (
-    VALIDATION_MAX_CONTENT_LENGTH, GENERATION_MAX_CONTENT_LENGTH,
+    VALIDATION_MAX_CONTENT_LENGTH, GENERATION_MAX_CONTENT_LENGTH, VALIDATION_MIN_CONTENT_LENGTH,
+    VALIDATION_MAX_CONTENT_TOKENS, GENERATION_MAX_CONTENT_TOKENS, TOKENIZER_ENCODING,
     VALIDATION_CRITERIA, NODE_TEMPLATE_PATH,
     VALIDATION_PROMPT_TEMPLATE, GENERATION_PROMPT_TEMPLATE,
     GENERATION_JSON_TEMPLATE
@@ -15,12 +17,36 @@ from config.settings import (
 from langsmith import traceable
 from pydantic import BaseModel, Field
 from trustcall import create_extractor
+import tiktoken
+from utils.llm_cache import make_cache_key, get_cached_response, set_cached_response
+from utils.chroma_utility import find_cached_generation, store_generated_content
 import re
 import json
 
 logger = get_logger(__name__)
 
 
+@lru_cache(maxsize=1)
+def _get_encoding() -> Optional["tiktoken.Encoding"]:
+    """Load the tokenizer once; None if its BPE file can't be loaded (e.g. offline)"""
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(f"Tokenizer {TOKENIZER_ENCODING} unavailable, using character limits only: {e}")
+        return None
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens (unchanged if no tokenizer is available)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
 # ===== PYDANTIC MODELS =====
 
 class ValidationResult(BaseModel):
@@ -115,7 +141,8 @@ class StateManager(ABC):
 class ValidationConfig:
     """Configuration for validation"""
     max_content_length: int = VALIDATION_MAX_CONTENT_LENGTH
-    validation_criteria: Dict[str, str] = None
+    min_content_length: int = VALIDATION_MIN_CONTENT_LENGTH
+    validation_criteria: Mapping[str, str] = None
     
     def __post_init__(self):
         if self.validation_criteria is None:
@@ -133,7 +160,9 @@ class ValidationPromptBuilder(PromptBuilder):
     """Builds validation prompts"""
     
     def build_prompt(self, context: Dict[str, Any]) -> str:
-        content = context.get("content", "")[:VALIDATION_MAX_CONTENT_LENGTH]
+        content = truncate_to_tokens(
+            context.get("content", "")[:VALIDATION_MAX_CONTENT_LENGTH], VALIDATION_MAX_CONTENT_TOKENS
+        )
         standard = context.get("standard", "")
         subject = context.get("subject", "")
         chapter = context.get("chapter", "")
@@ -152,8 +181,14 @@ class GenerationPromptBuilder(PromptBuilder):
     def __init__(self, template: str):
         self.template = template
     
+    def build_content(self, context: Dict[str, Any]) -> str:
+        """Content exactly as it is placed in the prompt"""
+        return truncate_to_tokens(
+            context.get("content", "")[:GENERATION_MAX_CONTENT_LENGTH], GENERATION_MAX_CONTENT_TOKENS
+        )
+    
     def build_prompt(self, context: Dict[str, Any]) -> str:
-        content = context.get("content", "")[:GENERATION_MAX_CONTENT_LENGTH]
+        content = self.build_content(context)
         standard = context.get("standard", "")
         subject = context.get("subject", "")
         chapter = context.get("chapter", "")
@@ -178,17 +213,31 @@ class TrustcallJSONParser(JSONParser):
             tools=[model_class],
             tool_choice=model_class.__name__
         )
+        # Schema changes (fields, descriptions) must not serve old-shape results
+        self.schema_hash = make_cache_key(model_class.model_json_schema())
     
     def parse_json(self, text: str) -> Optional[Dict[str, Any]]:
         try:
+            # Identical prompts at the same settings return the stored result
+            cache_key = make_cache_key(
+                get_model_name(), self.model_class.__name__, self.schema_hash,
+                getattr(self.llm, "temperature", None),
+                getattr(self.llm, "max_tokens", None), text
+            )
+            cached = get_cached_response(cache_key)
+            if cached is not None:
+                return cached
+            
             # Use trustcall to extract structured output
             result = self.extractor.invoke({
                 "messages": [{"role": "user", "content": text}]
             })
+            TokenUsageTracker.log_message_usage(result.get("messages", []), self.model_class.__name__)
             
             if result["responses"]:
-                parsed_result = result["responses"][0]
-                return parsed_result.model_dump()
+                parsed_result = result["responses"][0].model_dump()
+                set_cached_response(cache_key, parsed_result)
+                return parsed_result
             else:
                 logger.error(f"No {self.model_class.__name__} result returned from trustcall")
                 return None
@@ -209,10 +258,12 @@ class TokenUsageTracker:
     """Tracks token usage for cost monitoring"""
     
     @staticmethod
-    def log_usage(response: Any, operation: str) -> None:
-        if hasattr(response, 'usage'):
-            usage = response.usage
-            logger.info(f"{operation} tokens - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}")
+    def log_message_usage(messages: List[Any], operation: str) -> None:
+        for message in messages:
+            usage = getattr(message, 'usage_metadata', None)
+            if usage:
+                cached = (usage.get('input_token_details') or {}).get('cache_read', 0)
+                logger.info(f"{operation} tokens - Input: {usage['input_tokens']} (cached: {cached}), Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
 
 
 # ===== VALIDATION LOGIC =====
@@ -224,23 +275,29 @@ class ContentValidator:
         self.config = config
         self.prompt_builder = ValidationPromptBuilder()
         self.state_manager = StateManagerImpl()
-        self.token_tracker = TokenUsageTracker()
+        self.json_parser: Optional[TrustcallJSONParser] = None
+    
+    def _get_json_parser(self) -> TrustcallJSONParser:
+        """Create the validation LLM and trustcall parser on first use"""
+        if self.json_parser is None:
+            self.json_parser = TrustcallJSONParser(get_validation_llm(), ValidationResult)
+        return self.json_parser
     
     def validate(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Validate content using SOLID principles with trustcall"""
         try:
+            # Decide cheaply where possible, skipping the LLM round-trip
+            validation_result = self._precheck(state)
+            if validation_result:
+                self.state_manager.update_state(state, "validation_result", validation_result)
+                self._check_validation_result(state, validation_result)
+                return state
+            
             # Build prompt
             prompt = self.prompt_builder.build_prompt(state)
             
-            # Get LLM and create trustcall parser
-            llm = get_validation_llm()
-            json_parser = TrustcallJSONParser(llm, ValidationResult)
-            
-            # Track usage (if available)
-            try:
-                self.token_tracker.log_usage(llm, "Validation")
-            except:
-                pass
+            # Reuse the LLM and trustcall parser across calls
+            json_parser = self._get_json_parser()
             
             # Parse response using trustcall
             validation_result = json_parser.parse_json(prompt)
@@ -257,6 +314,18 @@ class ContentValidator:
         
         return state
     
+    def _precheck(self, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a validation result when heuristics decide, else None"""
+        content = state.get("content") or ""
+        if len(content.strip()) < self.config.min_content_length:
+            return ValidationResult(
+                grade_check="INAPPROPRIATE",
+                safety_check="APPROPRIATE",
+                relevance_check="NO_MATCH",
+                reason="Content is too short to produce educational materials"
+            ).model_dump()
+        return None
+    
     def _check_validation_result(self, state: Dict[str, Any], result: Dict[str, Any]) -> None:
         """Check if validation passed"""
         criteria = self.config.validation_criteria
@@ -286,8 +355,19 @@ class ContentGenerator:
     def __init__(self, config: GenerationConfig):
         self.config = config
         self.state_manager = StateManagerImpl()
-        self.token_tracker = TokenUsageTracker()
         self.prompt_builder = GenerationPromptBuilder(GENERATION_JSON_TEMPLATE)
+        self.json_parser: Optional[TrustcallJSONParser] = None
+        # Semantic cache entries are only valid for this model and prompt version
+        self.model_name = get_model_name() or ""
+        self.template_hash = make_cache_key(
+            GENERATION_PROMPT_TEMPLATE, GENERATION_JSON_TEMPLATE, GenerationResult.model_json_schema()
+        )
+    
+    def _get_json_parser(self) -> TrustcallJSONParser:
+        """Create the generation LLM and trustcall parser on first use"""
+        if self.json_parser is None:
+            self.json_parser = TrustcallJSONParser(get_generation_llm(), GenerationResult)
+        return self.json_parser
     
     def generate(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Generate content using SOLID principles with trustcall"""
@@ -296,19 +376,21 @@ class ContentGenerator:
             logger.warning("Skipping content generation - validation failed")
             return state
         
+        prompt = ""
         try:
+            # Reuse the generation of a near-identical upload of this chapter
+            cached_content = self._find_cached_generation(state)
+            if cached_content:
+                self.state_manager.update_state(state, "generated_content", cached_content)
+                self.state_manager.update_state(state, "success", True)
+                logger.info("Content generation served from semantic cache")
+                return state
+            
             # Build prompt
             prompt = self.prompt_builder.build_prompt(state)
             
-            # Get LLM and create trustcall parser
-            llm = get_generation_llm()
-            json_parser = TrustcallJSONParser(llm, GenerationResult)
-            
-            # Track usage (if available)
-            try:
-                self.token_tracker.log_usage(llm, "Generation")
-            except:
-                pass
+            # Reuse the LLM and trustcall parser across calls
+            json_parser = self._get_json_parser()
             
             # Parse response using trustcall
             generated_content = json_parser.parse_json(prompt)
@@ -316,6 +398,7 @@ class ContentGenerator:
             if generated_content:
                 self.state_manager.update_state(state, "generated_content", generated_content)
                 self.state_manager.update_state(state, "success", True)
+                self._store_generation(state, generated_content)
                 logger.info("Content generation completed successfully")
             else:
                 self.state_manager.update_state(state, "error", "Failed to generate valid JSON")
@@ -326,7 +409,28 @@ class ContentGenerator:
         
         return state
     
-
+    def _find_cached_generation(self, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Look up a cached generation for semantically matching content"""
+        try:
+            return find_cached_generation(
+                state.get("standard", ""), state.get("subject", ""),
+                state.get("chapter", ""), self.prompt_builder.build_content(state),
+                self.model_name, self.template_hash
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None
+    
+    def _store_generation(self, state: Dict[str, Any], generated_content: Dict[str, Any]) -> None:
+        """Store a generation in the semantic cache"""
+        try:
+            store_generated_content(
+                state.get("standard", ""), state.get("subject", ""),
+                state.get("chapter", ""), self.prompt_builder.build_content(state),
+                generated_content, self.model_name, self.template_hash
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {e}")
     
     def _handle_generation_error(self, state: Dict[str, Any], error: Exception, prompt: str) -> None:
         """Handle generation errors"""
@@ -339,15 +443,25 @@ class ContentGenerator:
 
 # ===== GRAPH NODES (LEGACY INTERFACE) =====
 
+@lru_cache(maxsize=1)
+def get_content_validator() -> ContentValidator:
+    """Shared validator, built once per process"""
+    return ContentValidator(ValidationConfig())
+
+
+@lru_cache(maxsize=1)
+def get_content_generator() -> ContentGenerator:
+    """Shared generator, built once per process"""
+    return ContentGenerator(GenerationConfig())
+
+
 @traceable(name="content_validation")
 def validate_content(state: Dict[str, Any]) -> Dict[str, Any]:
     """Validate content - Legacy interface for graph compatibility"""
-    validator = ContentValidator(ValidationConfig())
-    return validator.validate(state)
+    return get_content_validator().validate(state)
 
 
 @traceable(name="educational_content_generation")
 def generate_content(state: Dict[str, Any]) -> Dict[str, Any]:
     """Generate content - Legacy interface for graph compatibility"""
-    generator = ContentGenerator(GenerationConfig())
-    return generator.generate(state) 
\ No newline at end of file
+    return get_content_generator().generate(state) 
\ No newline at end of file
@@ -8,7 +8,9 @@ from langchain_openai import AzureChatOpenAI, ChatOpenAI
 from openai import AzureOpenAI, OpenAI
 from dotenv import load_dotenv
 from langsmith.wrappers import wrap_openai
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 load_dotenv()
@@ -41,7 +43,7 @@ class LLMConfig:
         self.azure_endpoint = os.getenv("AZURE_OPENAI_API_BASE")
         self.azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
         self.azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-        self.azure_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+        self.azure_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-10-01-preview")
         
         # OpenAI settings
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -56,6 +58,14 @@ class LLMConfig:
         self.generation_temperature = float(os.getenv("GENERATION_TEMPERATURE", "0.2"))
         self.generation_max_tokens = int(os.getenv("GENERATION_MAX_TOKENS", "4000"))
         
+        # HTTP transport shared by every client (keep-alive pool, HTTP/2)
+        # Per-request timeout in seconds; sized for 4000-token generations
+        self.http_timeout = float(os.getenv("LLM_HTTP_TIMEOUT", "180"))
+        self.http_max_connections = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "64"))
+        # SDK-level retries (exponential backoff with jitter) for 429/5xx/timeouts
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self.http_client = self._create_http_client()
+        
         # Setup LangSmith if available
         self._setup_langsmith()
     
@@ -67,16 +77,29 @@ class LLMConfig:
             os.environ["LANGCHAIN_PROJECT"] = self.langsmith_project
             os.environ["LANGCHAIN_ENDPOINT"] = self.langsmith_endpoint
     
+    def _create_http_client(self):
+        """Create the pooled HTTP/2 client reused across LLM calls"""
+        return httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_keepalive_connections=self.http_max_connections // 2,
+                max_connections=self.http_max_connections
+            ),
+            timeout=self.http_timeout
+        )
+    
     def get_openai_client(self):
         """Get OpenAI client based on provider"""
         if self.provider == "azure":
             return wrap_openai(AzureOpenAI(
                 azure_endpoint=self.azure_endpoint,
                 api_key=self.azure_api_key,
-                api_version=self.azure_api_version
+                api_version=self.azure_api_version,
+                http_client=self.http_client,
+                max_retries=self.max_retries
             ))
         else:
-            return wrap_openai(OpenAI(api_key=self.openai_api_key))
+            return wrap_openai(OpenAI(api_key=self.openai_api_key, http_client=self.http_client, max_retries=self.max_retries))
     
     def get_validation_llm(self):
         """Get validation LLM with low temperature for consistent outputs"""
@@ -87,14 +110,20 @@ class LLMConfig:
                 azure_deployment=self.azure_deployment,
                 api_version=self.azure_api_version,
                 temperature=self.validation_temperature,
-                max_tokens=self.validation_max_tokens
+                max_tokens=self.validation_max_tokens,
+                timeout=self.http_timeout,
+                http_client=self.http_client,
+                max_retries=self.max_retries
             )
         else:
             return ChatOpenAI(
                 api_key=self.openai_api_key,
                 model=self.openai_model,
                 temperature=self.validation_temperature,
-                max_tokens=self.validation_max_tokens
+                max_tokens=self.validation_max_tokens,
+                timeout=self.http_timeout,
+                http_client=self.http_client,
+                max_retries=self.max_retries
             )
     
     def get_generation_llm(self):
@@ -106,14 +135,20 @@ class LLMConfig:
                 azure_deployment=self.azure_deployment,
                 api_version=self.azure_api_version,
                 temperature=self.generation_temperature,
-                max_tokens=self.generation_max_tokens
+                max_tokens=self.generation_max_tokens,
+                timeout=self.http_timeout,
+                http_client=self.http_client,
+                max_retries=self.max_retries
             )
         else:
             return ChatOpenAI(
                 api_key=self.openai_api_key,
                 model=self.openai_model,
                 temperature=self.generation_temperature,
-                max_tokens=self.generation_max_tokens
+                max_tokens=self.generation_max_tokens,
+                timeout=self.http_timeout,
+                http_client=self.http_client,
+                max_retries=self.max_retries
             )
     
     def get_model_name(self):
@@ -147,6 +182,11 @@ class WebScraper:
     
     def __init__(self, api_key: str):
         self.api_key = api_key
+        # Keep-alive session so repeated scrapes reuse the TLS connection;
+        # pool_block caps concurrent connections at pool_maxsize across the
+        # worker threads sharing it (extra callers wait for a free one)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, pool_block=True))
     
     def scrape_url(self, url: str) -> str:
         """Scrape content from a URL using Serper API"""
@@ -160,7 +200,7 @@ class WebScraper:
             'Content-Type': 'application/json'
         }
         
-        response = requests.post(scrape_url, headers=headers, data=payload)
+        response = self.session.post(scrape_url, headers=headers, data=payload)
         response.raise_for_status()
         return response.text
 
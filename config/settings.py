@@ -2,8 +2,9 @@
 Application Settings - Only includes settings actually used in the codebase
 """
 import os
+from types import MappingProxyType
 from dotenv import load_dotenv
-from typing import Tuple, Dict
+from typing import Tuple, Mapping
 
 load_dotenv()
 
@@ -16,6 +17,15 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 # File Validation Settings (used in routes/route.py)
 SUPPORTED_PDF_EXTENSION = ".pdf"  # Used in route.py for PDF validation
 
+# Pages with at least this much embedded text skip rasterizing and OCR
+PDF_TEXT_LAYER_MIN_CHARS = int(os.getenv("PDF_TEXT_LAYER_MIN_CHARS", "200"))
+# ...and at most this share of unreadable characters (U+FFFD, private-use,
+# control, unassigned), as produced by fonts without proper Unicode mappings
+PDF_TEXT_LAYER_MAX_BAD_CHAR_RATIO = float(os.getenv("PDF_TEXT_LAYER_MAX_BAD_CHAR_RATIO", "0.02"))
+
+# Parallel pdftoppm processes used to rasterize scanned PDFs
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(8, os.cpu_count() or 1))))
+
 # ===== IMAGE PROCESSING SETTINGS =====
 # Used in utils/utility.py
 
@@ -26,6 +36,15 @@ IMAGE_TARGET_SIZE: Tuple[int, int] = (
 IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
 IMAGE_MAX_TOKENS = int(os.getenv("IMAGE_MAX_TOKENS", "3000"))
 IMAGE_TEMPERATURE = float(os.getenv("IMAGE_TEMPERATURE", "0.1"))
+# Vision detail level: "low" (512px, fewest tokens), "high" or "auto"
+IMAGE_DETAIL = os.getenv("IMAGE_DETAIL", "auto")
+# Image uploads are read by "mistral" OCR or the "vision" chat model (agents/helper.py)
+IMAGE_TEXT_EXTRACTOR = os.getenv("IMAGE_TEXT_EXTRACTOR", "mistral").lower()
+# Encoded images kept in memory (keyed by content digest and encode settings)
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "256"))
+# JPEGs larger than this (bytes) are re-encoded with the optimized Huffman pass;
+# set above typical page sizes (~100-200 KB) so normal pages are encoded once
+IMAGE_OPTIMIZE_THRESHOLD = int(os.getenv("IMAGE_OPTIMIZE_THRESHOLD", str(512 * 1024)))
 
 # ===== VISION AI PROMPTS =====
 # Used in utils/utility.py
@@ -44,6 +63,12 @@ VISION_USER_PROMPT = os.getenv("VISION_USER_PROMPT", (
     "clearly read something, do not guess or fill in gaps."
 ))
 
+# ===== OCR SETTINGS =====
+# Used in utils/text_extract_MistralAI.py
+
+# Pages OCR'd concurrently (bounded to stay under provider rate limits)
+MISTRAL_OCR_CONCURRENCY = int(os.getenv("MISTRAL_OCR_CONCURRENCY", "4"))
+
 # ===== NODE PROCESSING SETTINGS =====
 # Used in agents/nodes.py
 
@@ -51,16 +76,41 @@ VISION_USER_PROMPT = os.getenv("VISION_USER_PROMPT", (
 VALIDATION_MAX_CONTENT_LENGTH = int(os.getenv("VALIDATION_MAX_CONTENT_LENGTH", "1000"))
 GENERATION_MAX_CONTENT_LENGTH = int(os.getenv("GENERATION_MAX_CONTENT_LENGTH", "3000"))
 
-# Validation Criteria
-VALIDATION_CRITERIA: Dict[str, str] = {
+# Token caps applied after the character limits (keeps non-English prompts bounded)
+VALIDATION_MAX_CONTENT_TOKENS = int(os.getenv("VALIDATION_MAX_CONTENT_TOKENS", "300"))
+GENERATION_MAX_CONTENT_TOKENS = int(os.getenv("GENERATION_MAX_CONTENT_TOKENS", "1000"))
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+# Content shorter than this fails validation without an LLM call
+VALIDATION_MIN_CONTENT_LENGTH = int(os.getenv("VALIDATION_MIN_CONTENT_LENGTH", "50"))
+
+# Validation Criteria (read-only, built once at import)
+VALIDATION_CRITERIA: Mapping[str, str] = MappingProxyType({
     "grade_check": os.getenv("VALIDATION_GRADE_CHECK", "APPROPRIATE"),
     "safety_check": os.getenv("VALIDATION_SAFETY_CHECK", "APPROPRIATE"),
     "relevance_check": os.getenv("VALIDATION_RELEVANCE_CHECK", "MATCH")
-}
+})
 
 # Template Path
 NODE_TEMPLATE_PATH = os.getenv("NODE_TEMPLATE_PATH", None)
 
+# ===== LLM RESPONSE CACHE =====
+# Used in utils/llm_cache.py
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "./.llm_cache")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 86400)))
+
+# ===== SEMANTIC GENERATION CACHE =====
+# Used in utils/chroma_utility.py
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Embedding matches are confirmed on the full prompt content (word-sequence ratio)
+SEMANTIC_CACHE_MIN_TEXT_SIMILARITY = float(os.getenv("SEMANTIC_CACHE_MIN_TEXT_SIMILARITY", "0.9"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 86400)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+
 # ===== NODE PROMPTS =====
 # Used in agents/nodes.py
 
@@ -80,13 +130,16 @@ VALIDATION_PROMPT_TEMPLATE = os.getenv("VALIDATION_PROMPT_TEMPLATE", (
     "- relevance_check: Use MATCH if content directly relates to the subject/chapter, PARTIAL_MATCH if somewhat related, NO_MATCH if unrelated\n"
 ))
 
+# Static instructions first, per-request fields last, so the shared
+# prefix qualifies for provider-side prompt caching
 GENERATION_PROMPT_TEMPLATE = os.getenv("GENERATION_PROMPT_TEMPLATE", (
-    "Create educational materials for {standard} {subject} - {chapter}.\n\n"
-    "Content: {content}\n\n"
+    "Create educational materials from the content below.\n\n"
     "Return valid JSON **only**, wrapped inside a Markdown JSON code block like this:\n\n"
     "```json\n"
     "{template}\n"
-    "```"
+    "```\n\n"
+    "Materials for: {standard} {subject} - {chapter}\n\n"
+    "Content: {content}"
 ))
 
 # ===== JSON TEMPLATES =====
@@ -3,6 +3,8 @@ Clean API Routes with SOLID Principles and Singleton Pattern
 """
 from utils.chroma_utility import store_textbook_transcript, get_textbook_transcript
 from agents.helper import extract_content_from_files, create_initial_state, format_response, get_youtube_transcript #, clean_for_llm_prompt
+from utils.text_extract_pypdfium import extract_text_layer, bad_char_ratio
+from utils.text_extract_MistralAI import extract_texts_from_images
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
@@ -12,14 +14,21 @@ import tempfile
 import os
 import json
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from agents.graph import graph
+from agents.nodes import validate_content, generate_content
 from pdf2image import convert_from_path
 # Initialize logging
 from config.logging import setup_logging
 from config.configuration import get_weburl_content
-from config.settings import SUPPORTED_PDF_EXTENSION
+from config.settings import (
+    SUPPORTED_PDF_EXTENSION, PDF_TEXT_LAYER_MIN_CHARS, PDF_TEXT_LAYER_MAX_BAD_CHAR_RATIO, PDF_RENDER_WORKERS
+)
 logger = setup_logging()
 
+# Uploads are copied to disk in chunks rather than read whole into memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 # ===== REQUEST MODELS =====
 
 class GetContentRequest(BaseModel):
@@ -85,11 +94,11 @@ class APIService:
         elif content_type == "web_url":
             if not content_or_url:
                 raise HTTPException(400, "web_url required")
-            return get_weburl_content(content_or_url)
+            return await asyncio.to_thread(get_weburl_content, content_or_url)
         elif content_type == "youtube_url":
             if not content_or_url:
                 raise HTTPException(400, "youtube_url required")
-            return get_youtube_transcript(content_or_url)
+            return await asyncio.to_thread(get_youtube_transcript, content_or_url)
         elif content_type == "pdf":
             if not files:
                 raise HTTPException(400, "files required for PDF processing")
@@ -110,33 +119,102 @@ class APIService:
         if not files[0].filename.lower().endswith(SUPPORTED_PDF_EXTENSION):
             raise HTTPException(400, "File must be a PDF")
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=SUPPORTED_PDF_EXTENSION) as temp_pdf:
-            temp_pdf.write(await files[0].read())
-            temp_pdf.flush()
+        pdf_path = await self._save_upload(files[0], SUPPORTED_PDF_EXTENSION)
         
+        # Extraction blocks (rasterizing, OCR), so keep it off the event loop
+        return await asyncio.to_thread(self._extract_pdf, pdf_path)
+    
+    async def _save_upload(self, file: UploadFile, suffix: str) -> str:
+        """Copy an upload to a temporary file in chunks - Single Responsibility"""
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                temp_file.write(chunk)
+        return temp_file.name
+    
+    def _extract_pdf(self, pdf_path: str) -> str:
+        """Extract text from a saved PDF file - Single Responsibility"""
         try:
-            pil_images = convert_from_path(temp_pdf.name, dpi=150)
+            # Pages with a usable text layer are kept as-is; image-heavy or
+            # garbled pages are rasterized and OCR'd
+            page_texts = self._extract_pdf_text_layer(pdf_path)
+            ocr_pages = [index for index, text in enumerate(page_texts) if not self._is_usable_text_layer(text)]
+            if page_texts and not ocr_pages:
+                return "\n\n".join(page_texts)
+            pil_images = self._render_pages(pdf_path, ocr_pages if page_texts else None)
         finally:
-            os.unlink(temp_pdf.name)
+            os.unlink(pdf_path)
         
-        image_paths = []
-        for i, img in enumerate(pil_images):
-            temp_img = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-            img.save(temp_img.name, "JPEG", quality=70, optimize=True)
-            image_paths.append(temp_img.name)
+        # Encode pages in parallel; PIL releases the GIL while encoding
+        with ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS) as executor:
+            image_paths = list(executor.map(self._save_page_image, pil_images))
         
-        content = extract_content_from_files(None, image_paths)
+        try:
+            ocr_texts = extract_texts_from_images(image_paths)
+        finally:
+            for path in image_paths:
+                try:
+                    os.unlink(path)
+                except:
+                    pass
         
-        for path in image_paths:
-            try:
-                os.unlink(path)
-            except:
-                pass
+        if not page_texts:
+            page_texts = ocr_texts
+        else:
+            for index, text in zip(ocr_pages, ocr_texts):
+                # Keep a short but readable text layer if OCR found nothing;
+                # garbled text is never kept
+                if text or bad_char_ratio(page_texts[index]) > PDF_TEXT_LAYER_MAX_BAD_CHAR_RATIO:
+                    page_texts[index] = text
         
-        if content.startswith("ERROR"):
-            raise HTTPException(400, f"PDF processing failed: {content}")
+        content = "\n\n".join(text for text in page_texts if text)
+        if not content:
+            raise HTTPException(400, "PDF processing failed: no text extracted")
         return content
     
+    @staticmethod
+    def _is_usable_text_layer(text: str) -> bool:
+        """Check a page's text layer is long enough and readable - Single Responsibility"""
+        return len(text) >= PDF_TEXT_LAYER_MIN_CHARS and bad_char_ratio(text) <= PDF_TEXT_LAYER_MAX_BAD_CHAR_RATIO
+    
+    def _render_pages(self, pdf_path: str, page_indexes: Optional[List[int]]) -> list:
+        """Rasterize the given 0-based pages, or every page when None - Single Responsibility"""
+        if page_indexes is None:
+            # Page ranges are split across parallel pdftoppm processes
+            return convert_from_path(pdf_path, dpi=150, thread_count=PDF_RENDER_WORKERS)
+        
+        images = []
+        for first, last in self._page_runs(page_indexes):
+            images.extend(convert_from_path(
+                pdf_path, dpi=150, thread_count=PDF_RENDER_WORKERS,
+                first_page=first + 1, last_page=last + 1
+            ))
+        return images
+    
+    @staticmethod
+    def _page_runs(page_indexes: List[int]) -> List[tuple]:
+        """Group sorted page indexes into (first, last) runs of consecutive pages"""
+        runs = []
+        for index in page_indexes:
+            if runs and index == runs[-1][1] + 1:
+                runs[-1] = (runs[-1][0], index)
+            else:
+                runs.append((index, index))
+        return runs
+    
+    def _save_page_image(self, img) -> str:
+        """Save a rendered PDF page as a temporary JPEG - Single Responsibility"""
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_img:
+            img.save(temp_img, "JPEG", quality=70, optimize=True)
+        return temp_img.name
+    
+    def _extract_pdf_text_layer(self, pdf_path: str) -> List[str]:
+        """Extract embedded PDF text per page, empty if unavailable - Single Responsibility"""
+        try:
+            return extract_text_layer(pdf_path)
+        except Exception as e:
+            logger.warning(f"PDF text layer extraction failed, falling back to OCR: {str(e)}")
+            return []
+    
     async def _process_images(self, files: List[UploadFile]) -> str:
         """Process image files - Single Responsibility"""
         if not files:
@@ -144,11 +222,9 @@ class APIService:
         
         image_paths = []
         for file in files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as f:
-                f.write(await file.read())
-                image_paths.append(f.name)
+            image_paths.append(await self._save_upload(file, ".jpg"))
         
-        content = extract_content_from_files(None, image_paths)
+        content = await asyncio.to_thread(extract_content_from_files, None, image_paths)
         
         for path in image_paths:
             try:
@@ -183,7 +259,7 @@ class APIService:
         try:
             content = await self.process_content_extraction(content_type, files_list, content_or_url)
             # content = clean_for_llm_prompt(content)
-            ids = store_textbook_transcript(standard, subject, chapter, content, content_type)
+            ids = await asyncio.to_thread(store_textbook_transcript, standard, subject, chapter, content, content_type)
             return ids
         except Exception as e:
             logger.error(f"Upload error: {str(e)}")
@@ -198,7 +274,7 @@ class APIService:
         chapter = request.chapter
         
         try:
-            content = get_textbook_transcript(ids)
+            content = await asyncio.to_thread(get_textbook_transcript, ids)
             if content is None:
                 raise HTTPException(404, f"Content not found with ID: {ids}")
             
@@ -215,8 +291,7 @@ class APIService:
                 
                 # Call the validation step dynamically
                 validation_state = create_initial_state(standard, subject, chapter, content)
-                from agents.nodes import validate_content
-                validation_result = validate_content(validation_state)
+                validation_result = await asyncio.to_thread(validate_content, validation_state)
                 
                 # Check validation results
                 validation_data = validation_result.get('validation_result', {})
@@ -260,8 +335,7 @@ class APIService:
                 generation_state["is_valid"] = True
                 generation_state["validation_result"] = validation_result.get("validation_result", {})
                 
-                from agents.nodes import generate_content
-                generation_result = generate_content(generation_state)
+                generation_result = await asyncio.to_thread(generate_content, generation_state)
                 final_response = format_response(generation_result)
                 
                 # Send final result
@@ -1,6 +1,17 @@
 import chromadb
 import uuid
 import os
+import json
+import time
+from difflib import SequenceMatcher
+from config.settings import (
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MIN_TEXT_SIMILARITY,
+    SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_MAX_ENTRIES
+)
+from utils.llm_cache import cache as payload_cache
+
+# Nearest neighbours checked against the full content
+SEMANTIC_CACHE_CANDIDATES = 5
 
 # Initialize ChromaDB with persistent storage
 persist_directory = "./chroma_db"
@@ -8,29 +19,35 @@ os.makedirs(persist_directory, exist_ok=True)
 client = chromadb.PersistentClient(path=persist_directory)
 def store_textbook_transcript(standard, subject, chapter, content, content_type):
 
+    return store_many([{
+        "standard": standard,
+        "subject": subject,
+        "chapter": chapter,
+        "content": content,
+        "content_type": content_type
+    }])[0]
+
+
+def store_many(records):
+
     collection = client.get_or_create_collection("textbook_transcripts")
 
-    # Generate a UUID for this record
-    content_id = str(uuid.uuid4())
+    # Generate a UUID for each record
+    content_ids = [str(uuid.uuid4()) for _ in records]
 
-    # Store the content with full metadata
+    # Store all records in one add so they are embedded as a single batch
+    # (add is synchronous on PersistentClient; no read-back needed)
     collection.add(
-        documents=[content],
+        documents=[record["content"] for record in records],
         metadatas=[{
-            "standard": standard,
-            "subject": subject,
-            "chapter": chapter,
-            "content_type": content_type
-        }],
-        ids=[content_id]
+            "standard": record["standard"],
+            "subject": record["subject"],
+            "chapter": record["chapter"],
+            "content_type": record["content_type"]
+        } for record in records],
+        ids=content_ids
     )
-    
-    # Verify the content was stored
-    result = collection.get(ids=[content_id])
-    if result["ids"]:
-        return content_id
-    return None
-            
+    return content_ids
 
 
 def get_textbook_transcript(ids):
@@ -44,5 +61,97 @@ def get_textbook_transcript(ids):
     return None
 
 
+def _get_generation_cache():
+    # Cosine space so distance = 1 - similarity
+    return client.get_or_create_collection(
+        "generation_cache", metadata={"hnsw:space": "cosine"}
+    )
 
-    
+
+def _text_similarity(a, b):
+    # Word-sequence similarity over the whole text; the embedding only sees
+    # the opening ~256 tokens, so this guards against chapters that merely
+    # start the same way
+    return SequenceMatcher(None, a.lower().split(), b.lower().split(), autojunk=False).ratio()
+
+
+def _payload_key(cache_id):
+    return f"generation:{cache_id}"
+
+
+def find_cached_generation(standard, subject, chapter, content, model, template_hash):
+
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+
+    # Nearest unexpired generations for the same tags, model and prompt version
+    collection = _get_generation_cache()
+    result = collection.query(
+        query_texts=[content],
+        n_results=SEMANTIC_CACHE_CANDIDATES,
+        where={"$and": [
+            {"standard": standard},
+            {"subject": subject},
+            {"chapter": chapter},
+            {"model": model},
+            {"template_hash": template_hash},
+            {"created_at": {"$gte": int(time.time()) - SEMANTIC_CACHE_TTL}}
+        ]},
+        include=["documents", "distances"]
+    )
+
+    if result["ids"] and result["ids"][0]:
+        for cache_id, distance, document in zip(result["ids"][0], result["distances"][0], result["documents"][0]):
+            if 1 - distance < SEMANTIC_CACHE_THRESHOLD:
+                break
+            if _text_similarity(content, document) >= SEMANTIC_CACHE_MIN_TEXT_SIMILARITY:
+                generated_content = payload_cache.get(_payload_key(cache_id))
+                if generated_content is not None:
+                    return json.loads(generated_content)
+    return None
+
+
+def store_generated_content(standard, subject, chapter, content, generated_content, model, template_hash):
+
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+
+    # Embed the prompt content; the generation itself lives in the disk cache
+    # so Chroma metadata stays small
+    collection = _get_generation_cache()
+    cache_id = str(uuid.uuid4())
+    payload_cache.set(_payload_key(cache_id), json.dumps(generated_content), expire=SEMANTIC_CACHE_TTL)
+    collection.add(
+        documents=[content],
+        metadatas=[{
+            "standard": standard,
+            "subject": subject,
+            "chapter": chapter,
+            "model": model,
+            "template_hash": template_hash,
+            "created_at": int(time.time())
+        }],
+        ids=[cache_id]
+    )
+    if collection.count() > SEMANTIC_CACHE_MAX_ENTRIES:
+        prune_generation_cache(collection)
+    return cache_id
+
+
+def prune_generation_cache(collection=None):
+
+    # Drop expired generations, then the oldest down to 90% of the cap so
+    # the next prune is thousands of stores away
+    collection = collection or _get_generation_cache()
+    collection.delete(where={"created_at": {"$lt": int(time.time()) - SEMANTIC_CACHE_TTL}})
+
+    excess = collection.count() - int(SEMANTIC_CACHE_MAX_ENTRIES * 0.9)
+    if excess > 0:
+        entries = collection.get(include=["metadatas"])
+        oldest = sorted(
+            zip(entries["ids"], entries["metadatas"]),
+            key=lambda entry: entry[1].get("created_at", 0)
+        )[:excess]
+        collection.delete(ids=[entry_id for entry_id, _ in oldest])
+        for entry_id, _ in oldest:
+            payload_cache.delete(_payload_key(entry_id))
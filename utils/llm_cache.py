@@ -0,0 +1,51 @@
+"""
+Deterministic LLM Response Cache
+Disk-backed, keyed by a SHA-256 of everything that shapes the response
+"""
+import hashlib
+import json
+import mmap
+import os
+from typing import Any, Optional
+import diskcache
+from config.logging import get_logger
+from config.settings import LLM_CACHE_ENABLED, LLM_CACHE_DIR, LLM_CACHE_TTL
+
+logger = get_logger(__name__)
+
+# Initialize the cache with persistent storage
+cache = diskcache.Cache(LLM_CACHE_DIR)
+_stats = {"hits": 0, "lookups": 0}
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable cache key from the model, prompt and call parameters"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file's bytes, hashed from a memory map rather than a read copy"""
+    digest = hashlib.sha256()
+    if os.path.getsize(file_path) > 0:
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest.update(mapped)
+    return digest.hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[Any]:
+    """Return the cached response for a key, or None on a miss"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    _stats["lookups"] += 1
+    value = cache.get(key)
+    if value is not None:
+        _stats["hits"] += 1
+        logger.info(f"LLM cache hit - Hit rate: {_stats['hits']}/{_stats['lookups']}")
+    return value
+
+
+def set_cached_response(key: str, value: Any) -> None:
+    """Store a response under a key with the configured TTL"""
+    if LLM_CACHE_ENABLED and value is not None:
+        cache.set(key, value, expire=LLM_CACHE_TTL)
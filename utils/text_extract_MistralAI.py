@@ -1,6 +1,9 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from langsmith import traceable
+from config.settings import MISTRAL_OCR_CONCURRENCY
+from utils.llm_cache import make_cache_key, file_digest, get_cached_response, set_cached_response
 
 load_dotenv()
 from mistralai import Mistral
@@ -8,6 +11,10 @@ from mistralai import Mistral
 # Set up the client
 api_key =  os.getenv("MISTRAL_API_KEY")
 client = Mistral(api_key=api_key)
+OCR_MODEL = "mistral-ocr-latest"
+
+# Bounds in-flight page uploads/OCR calls across all requests
+ocr_pool = ThreadPoolExecutor(max_workers=MISTRAL_OCR_CONCURRENCY)
 
 @traceable(name="mistral_file_upload")
 def upload_file(file_path):
@@ -24,29 +31,38 @@ def upload_file(file_path):
 def ocr_from_url(url, file_type="document_url"):
     """Process OCR from given signed URL (PDF or image)."""
     response = client.ocr.process(
-        model="mistral-ocr-latest",
+        model=OCR_MODEL,
         document={"type": file_type, "document_url": url},
         include_image_base64=False
     )
     
     # Extract markdown from all pages
-    markdown_content = ""
-    for page in response.pages:
-        markdown_content += page.markdown + "\n\n"
+    markdown_content = "\n\n".join(page.markdown for page in response.pages)
     
     return markdown_content.strip()
 
+def ocr_file(file_path):
+    """OCR a file, reusing the stored text for identical file bytes."""
+    cache_key = make_cache_key(OCR_MODEL, file_digest(file_path))
+    cached = get_cached_response(cache_key)
+    if cached is not None:
+        return cached
+
+    file_url = upload_file(file_path)
+    file_text = ocr_from_url(file_url)
+    set_cached_response(cache_key, file_text)
+    return file_text
+
 # --- OCR for PDF ---
 @traceable(name="mistral_pdf_text_extraction")
 def extract_text_from_pdf(pdf_path):
-    pdf_url = upload_file(pdf_path)
-    pdf_text = ocr_from_url(pdf_url)
-    return pdf_text
+    return ocr_file(pdf_path)
 
 # --- OCR for Image Array ---
 @traceable(name="mistral_image_text_extraction")
 def extract_text_from_image(image_paths):
-    for image_path in image_paths:
-        image_url = upload_file(image_path)
-        image_text = ocr_from_url(image_url)
-        return image_text
\ No newline at end of file
+    return "\n\n".join(extract_texts_from_images(image_paths))
+
+def extract_texts_from_images(image_paths):
+    """OCR images concurrently, returning one text per image in input order."""
+    return list(ocr_pool.map(ocr_file, image_paths))
\ No newline at end of file
@@ -0,0 +1,37 @@
+import threading
+import unicodedata
+import pypdfium2 as pdfium
+from langsmith import traceable
+
+# pdfium is not thread-safe; serialize every document open/read/close
+_PDFIUM_LOCK = threading.Lock()
+
+# --- Text layer for PDF ---
+@traceable(name="pypdfium_text_extraction")
+def extract_text_layer(pdf_path):
+    """Extract the embedded text layer of a PDF, one string per page."""
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            page_texts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                page_texts.append(textpage.get_text_range().strip())
+                textpage.close()
+                page.close()
+            return page_texts
+        finally:
+            pdf.close()
+
+
+def bad_char_ratio(text):
+    """Share of characters that signal a broken text layer (replacement, private-use, control, unassigned)."""
+    if not text:
+        return 0.0
+    bad = 0
+    for char in text:
+        if char == "\ufffd":
+            bad += 1
+        elif not char.isspace() and unicodedata.category(char) in ("Co", "Cc", "Cn"):
+            bad += 1
+    return bad / len(text)